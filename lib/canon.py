@@ -0,0 +1,348 @@
+"""
+Contains a tag canonicalisation class that maps raw tags
+to canonical keys before those are counted by :code:`Tag_processor`.
+
+Tags are merged in this order:
+
+* a normalized key: lowercase, whitespace collapsed ("VRay", "vray ")
+* a user-supplied alias table ("hdr illumination" to "HDR")
+* optional fuzzy matching with a SymSpell-style deletion index ("hyperealistic" to "hyperrealistic"),
+  so no tag is compared with the whole vocabulary
+
+Fuzzy matching only merges a new spelling into a tag that was already seen
+at least :code:`min_count` times, so a rare typo joins an established tag, not the other way around.
+Differences in digits, in the first or the last character aren't treated as typos:
+"2d art" and "3d art", "berlin" and "perlin", "cycle" and "cycles" are kept apart.
+
+The displayed name is chosen by :code:`Tag_processor` by the majority of uses.
+Results are cached in an LRU cache.
+"""
+
+from functools import lru_cache
+from itertools import combinations
+from collections import defaultdict
+from .prompts import prompt_split
+
+def normalize_tag(tag):
+    """
+    Normalizes a tag: converts it to lowercase, collapses the whitespace.
+
+    Example:
+
+        >>> from lib.canon import normalize_tag
+        >>> normalize_tag(' Trending  on Artstation')
+        'trending on artstation'
+
+    Args:
+
+        tag (str): a tag name
+
+    Returns:
+
+        a normalized tag name
+    """
+    return ' '.join(tag.lower().split())
+
+def load_aliases(alias_file):
+    """
+    Loads an alias table from a file.
+    Each line contains a canonical tag, followed by its aliases,
+    delimited like prompt tags. Empty lines are skipped.
+
+    Example:
+
+        .. code-block:: text
+
+            HDR ; hdr illumination ; high dynamic range
+            vray | v-ray
+
+    Args:
+
+        alias_file (file): an opened text file
+
+    Returns:
+
+        a dict associating normalized aliases with canonical tags, spelled as in the file
+    """
+    aliases = {}
+    for line in alias_file:
+        names = list(filter(None, prompt_split(line)))
+        if len(names) > 1:
+            for alias in names[1:]:
+                aliases[normalize_tag(alias)] = names[0]
+    return aliases
+
+def edit_distance(a, b, max_distance):
+    """
+    Calculates an optimal string alignment distance
+    (Levenshtein distance with adjacent transpositions).
+
+    Example:
+
+        >>> from lib.canon import edit_distance
+        >>> edit_distance('hyperealistic', 'hyperrealistic', 2)
+        1
+        >>> edit_distance('vray', 'vary', 2)
+        1
+
+    Args:
+
+        a (str): a first string
+        b (str): a second string
+        max_distance (int): a distance limit
+
+    Returns:
+
+        a distance, or :code:`max_distance + 1` if it exceeds the limit
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_row = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        previous_row, prior_row = row, previous_row
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prior_row[j - 2] + 1)
+        if min(row) > max_distance:
+            return max_distance + 1
+    return min(row[-1], max_distance + 1)
+
+def generate_deletes(key, max_distance):
+    """
+    Generates all the strings produced by removing
+    up to :code:`max_distance` characters from a key.
+
+    Example:
+
+        >>> from lib.canon import generate_deletes
+        >>> sorted(generate_deletes('hdr', 1))
+        ['dr', 'hd', 'hdr', 'hr']
+
+    Args:
+
+        key (str): a normalized tag
+        max_distance (int): a maximum count of removed characters
+
+    Returns:
+
+        a set of strings, including the key itself
+    """
+    deletes = {key}
+    for distance in range(1, min(max_distance, len(key)) + 1):
+        for positions in combinations(range(len(key)), distance):
+            deletes.add(''.join(
+                char for index, char in enumerate(key) if index not in positions
+            ))
+    return deletes
+
+def is_typo(a, b):
+    """
+    Checks if two close spellings may differ by a typo.
+    Digits, first and last characters are significant,
+    so numbers, leading letters and plural endings aren't merged.
+
+    Example:
+
+        >>> from lib.canon import is_typo
+        >>> is_typo('hyperealistic', 'hyperrealistic')
+        True
+        >>> is_typo('2d art', '3d art')
+        False
+        >>> is_typo('asymmetric', 'symmetric')
+        False
+        >>> is_typo('cycle', 'cycles')
+        False
+
+    Args:
+
+        a (str): a normalized tag
+        b (str): another normalized tag
+
+    Returns:
+
+        True if the difference may be a typo
+    """
+    return (
+        a[:1] == b[:1] and a[-1:] == b[-1:] and
+        [char for char in a if char.isdigit()] == [char for char in b if char.isdigit()]
+    )
+
+class Tag_canonicalizer:
+    """
+    Maps raw tags to canonical keys.
+
+    Example:
+
+        >>> from lib.canon import Tag_canonicalizer
+        >>> tc = Tag_canonicalizer({'hdr illumination': 'HDR'}, fuzzy=True, min_count=2)
+        >>> tc.canonicalize('HDR illumination')
+        'hdr'
+        >>> [tc.canonicalize('hyperrealistic') for _ in range(2)]
+        ['hyperrealistic', 'hyperrealistic']
+        >>> tc.canonicalize('Hyperealistic')
+        'hyperrealistic'
+
+        Differences in digits, first or last characters are kept apart:
+
+        >>> [tc.canonicalize(tag) for tag in ['3d art', '3d art', '2d art']]
+        ['3d art', '3d art', '2d art']
+        >>> [tc.canonicalize(tag) for tag in ['symmetric', 'symmetric', 'asymmetric']]
+        ['symmetric', 'symmetric', 'asymmetric']
+        >>> [tc.canonicalize(tag) for tag in ['cycles', 'cycles', 'cycle']]
+        ['cycles', 'cycles', 'cycle']
+
+        A tag isn't merged into a spelling that isn't used more often:
+
+        >>> [tc.canonicalize(tag) for tag in ['primoridial', 'primordial']]
+        ['primoridial', 'primordial']
+
+    Attributes:
+
+        aliases (dict): associates normalized aliases with canonical tags
+        fuzzy (bool): enables fuzzy matching
+        max_distance (int): a maximum edit distance for fuzzy matching
+        min_length (int): a minimum tag length for fuzzy matching
+        min_count (int): a new spelling is only merged into a tag seen at least this many times
+        canonical_keys (set): canonical keys registered so far
+        key_counts (defaultdict): counts canonicalized tags for each canonical key
+        delete_index (defaultdict): associates deletion variants with canonical keys
+    """
+
+    def __init__(self, aliases=None, fuzzy=False, max_distance=1, min_length=5, min_count=5, cache_size=65536):
+        self.aliases = aliases if aliases is not None else {}
+        self.fuzzy = fuzzy
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self.min_count = min_count
+        self.canonical_keys = set()
+        self.key_counts = defaultdict(int)
+        self.delete_index = defaultdict(list)
+        # A mapping, once made, never changes, so it's safe to cache
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def canonicalize(self, tag):
+        """
+        Maps a raw tag to a canonical key and counts it.
+
+        Args:
+
+            tag (str): a raw tag name
+
+        Returns:
+
+            a canonical key for a tag
+        """
+        key = self.resolve(tag)
+        self.key_counts[key] += 1
+        return key
+
+    def base_key(self, tag):
+        """
+        Maps a tag to a normalized key with aliases applied, without fuzzy matching.
+
+        Example:
+
+            >>> from lib.canon import Tag_canonicalizer
+            >>> Tag_canonicalizer({'hdr illumination': 'HDR'}).base_key('HDR  Illumination')
+            'hdr'
+
+        Args:
+
+            tag (str): a raw tag name
+
+        Returns:
+
+            a normalized key
+        """
+        key = normalize_tag(tag)
+        return normalize_tag(self.aliases.get(key, key))
+
+    def lookup(self, tag):
+        """
+        Maps a tag to a canonical key without counting or registering it,
+        e.g. for queries.
+
+        Example:
+
+            >>> from lib.canon import Tag_canonicalizer
+            >>> tc = Tag_canonicalizer(fuzzy=True)
+            >>> tc.lookup('unknown tag')
+            'unknown tag'
+            >>> tc.canonical_keys
+            set()
+
+        Args:
+
+            tag (str): a raw tag name
+
+        Returns:
+
+            a canonical key for a tag
+        """
+        key = self.base_key(tag)
+        if not self.fuzzy or key in self.canonical_keys or len(key) < self.min_length:
+            return key
+        match = self.find_match(key)
+        return match if match is not None else key
+
+    def _resolve(self, tag):
+        """
+        Args:
+
+            tag (str): a raw tag name
+
+        Returns:
+
+            a canonical key for a tag, registers a new key if there's no match
+        """
+        key = self.base_key(tag)
+        if not self.fuzzy or key in self.canonical_keys:
+            return key
+        if len(key) >= self.min_length:
+            match = self.find_match(key)
+            # Only merge into a match that is already established
+            if match is not None and self.key_counts[match] >= self.min_count:
+                return match
+        self.register(key)
+        return key
+
+    def find_match(self, key):
+        """
+        Looks up the closest canonical key in the deletion index.
+        If there are several, the one registered first is selected.
+
+        Args:
+
+            key (str): a normalized tag
+
+        Returns:
+
+            a canonical key or None if nothing is close enough
+        """
+        best = None
+        for variant in generate_deletes(key, self.max_distance):
+            for candidate in self.delete_index.get(variant, ()):
+                if not is_typo(key, candidate[1]):
+                    continue
+                distance = edit_distance(key, candidate[1], self.max_distance)
+                if distance <= self.max_distance and (best is None or (distance, candidate[0]) < best[:2]):
+                    best = (distance, candidate[0], candidate[1])
+        return best[2] if best is not None else None
+
+    def register(self, key):
+        """
+        Registers a new canonical key and indexes its deletion variants.
+
+        Args:
+
+            key (str): a normalized tag
+        """
+        order = len(self.canonical_keys)
+        self.canonical_keys.add(key)
+        if self.fuzzy and len(key) >= self.min_length:
+            for variant in generate_deletes(key, self.max_distance):
+                self.delete_index[variant].append((order, key))
@@ -4,8 +4,11 @@ configuring commandline argument support and
 related :code:`argparse` actions.
 """
 
-from argparse import ArgumentParser, FileType, Action as ArgparseAction
-from .filtering import parse_number_filter
+from argparse import ArgumentParser, ArgumentTypeError, FileType, Action as ArgparseAction
+from .filtering import parse_number_filter, parse_query
+from .export import TABLE_FORMATS
+from .rank import RANK_MODES
+from .tiles import TILE_LAYOUTS
 # Needed by ReadableDirectoryAction
 from os.path import isdir
 from os import access, R_OK
@@ -34,6 +37,27 @@ class NumberFilterAction(ArgparseAction):
             Provide an input like \"<x\", \"= x\" or \">=x\", where x is an integer."""
             raise ValueError(exception_str.format(values))
 
+class UnitIntervalAction(ArgparseAction):
+    """
+    An :code:`argparse.Action` subclass that validates
+    float values between 0 and 1, like similarity thresholds.
+
+    Raises:
+
+        ValueError: if a value is not a number between 0 and 1
+    """
+    def __call__(self, parser, namespace, values, option_string=None):
+        try:
+            number = float(values)
+        except ValueError:
+            number = None
+        if number is not None and 0.0 < number <= 1.0:
+            setattr(namespace, self.dest, number)
+        else:
+            exception_str = """Wrong value for {}: {}.
+            Provide a number between 0 and 1."""
+            raise ValueError(exception_str.format(option_string, values))
+
 class ReadableDirectoryAction(ArgparseAction):
     """
     An :code:`argparse.Action` subclass that
@@ -46,11 +70,27 @@ class ReadableDirectoryAction(ArgparseAction):
     """
     def __call__(self, parser, namespace, values, option_string=None):
         if not isdir(values):
-            raise argparse.ArgumentTypeError("{0} is an invalid path".format(values))
+            raise ArgumentTypeError("{0} is an invalid path".format(values))
         if access(values, R_OK):
             setattr(namespace, self.dest, values)
         else:
-            raise argparse.ArgumentTypeError("{0} can not be accessed".format(values))
+            raise ArgumentTypeError("{0} can not be accessed".format(values))
+
+def positive_int(value):
+    """
+    An :code:`argparse` type for positive integers.
+
+    Raises:
+
+        ArgumentTypeError: if a value is not a positive integer
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise ArgumentTypeError("{0} is not a positive integer".format(value))
+    return number
 
 def configure_parser():
     """
@@ -64,19 +104,110 @@ def configure_parser():
         help='A prompt directory path containing one or more of newline-delimited files',
         action=ReadableDirectoryAction
     )
+    parser.add_argument(
+        '--workers',
+        help='A number of threads reading (and decompressing) prompt files',
+        type=positive_int
+    )
     parser.add_argument(
         '--output_file',
         help='An output file for a JSON graph',
         type=FileType('w', encoding='utf-8')
     )
+    parser.add_argument(
+        '--output_dir',
+        help='An output directory for tag and edge tables or graph tiles'
+    )
+    parser.add_argument(
+        '--table_format',
+        help='A format for tag and edge tables, "npy" is used if pyarrow is not installed',
+        choices=TABLE_FORMATS,
+        default='parquet'
+    )
     parser.add_argument(
         '--mode',
         help='Utility mode.',
-        choices=['count_tags', 'display_graph', 'export_graph']
+        choices=['count_tags', 'display_graph', 'export_graph', 'export_tables', 'export_tiles']
+    )
+    parser.add_argument(
+        '--nodes_per_tile',
+        help='A maximum count of nodes added by each tile in the "export_tiles" mode',
+        type=positive_int,
+        default=64
+    )
+    parser.add_argument(
+        '--edges_per_tile',
+        help='A maximum count of edges added by each tile in the "export_tiles" mode',
+        type=positive_int,
+        default=256
+    )
+    parser.add_argument(
+        '--layout',
+        help='A node layout for the "export_tiles" mode, "spectral" is faster on large graphs',
+        choices=TILE_LAYOUTS,
+        default='spring'
+    )
+    parser.add_argument(
+        '--layout_iterations',
+        help='An iteration count for the "spring" layout, each one takes quadratic time in the node count',
+        type=positive_int,
+        default=50
     )
     parser.add_argument(
         '--filter',
         help='Filter for tag counting.',
         action=NumberFilterAction
     )
+    parser.add_argument(
+        '--rank_mode',
+        help='A tag rank used for graphs and tables.',
+        choices=RANK_MODES,
+        default='frequency'
+    )
+    parser.add_argument(
+        '--rank_tol',
+        help='A tolerance for iterative rank modes',
+        type=float,
+        default=1e-6
+    )
+    parser.add_argument(
+        '--rank_init',
+        help='A table directory of a previous "export_tables" run to start iterative rank modes from'
+    )
+    parser.add_argument(
+        '--query',
+        help='Count only prompts with all the given tags, delimited like prompt tags; a "!" prefix excludes a tag.',
+        type=parse_query
+    )
+    parser.add_argument(
+        '--aliases',
+        help='A tag alias file, each line contains a canonical tag and its aliases delimited like prompt tags',
+        type=FileType('r', encoding='utf-8')
+    )
+    parser.add_argument(
+        '--fuzzy_tags',
+        help='Merge tags with similar spelling, like "hyperealistic" and "hyperrealistic".',
+        action='store_true'
+    )
+    parser.add_argument(
+        '--dedup_threshold',
+        help='Collapse prompts with tag sets more similar than a threshold (Jaccard similarity, 0..1).',
+        action=UnitIntervalAction
+    )
     return parser
+
+# Modes writing to an output directory
+OUTPUT_DIR_MODES = ['export_tables', 'export_tiles']
+
+def validate_args(parser, args):
+    """
+    Checks argument combinations :code:`argparse` can't check by itself,
+    exits with a parser error if those are wrong.
+
+    Args:
+
+        parser (ArgumentParser): a parser from :code:`configure_parser`
+        args (argparse.Namespace): parsed arguments
+    """
+    if args.mode in OUTPUT_DIR_MODES and args.output_dir is None:
+        parser.error('the "{}" mode requires --output_dir'.format(args.mode))
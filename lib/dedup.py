@@ -0,0 +1,208 @@
+"""
+Contains near-duplicate prompt detection based on MinHash signatures
+and banded locality-sensitive hashing (LSH).
+
+Prompts are compared by their tag sets (see :code:`lib.tags.extract_tags`),
+so prompts that differ by a single tag end up in one cluster
+without comparing all the prompt pairs.
+Tags are compared by a key function, e.g. :code:`Tag_canonicalizer.base_key`,
+so tags merged by aliases are equal; fuzzy matches aren't known before counting,
+so those are compared as different tags.
+
+All the heavy steps are vectorised with NumPy and processed in chunks,
+so the memory use is bounded by the signature matrix:
+:code:`prompt count * num_perm * 4` bytes.
+"""
+
+from zlib import crc32
+import numpy as np
+
+# Rows processed per chunk while building and comparing signatures
+CHUNK_SIZE = 65536
+
+def lsh_params(threshold, num_perm):
+    """
+    Picks a band count and a band size for a Jaccard similarity threshold.
+
+    The similarity where the candidate probability is 0.5
+    is approximately :code:`(1 / bands) ** (1 / rows)`,
+    the pair closest to the threshold is selected.
+
+    Example:
+
+        >>> from lib.dedup import lsh_params
+        >>> lsh_params(0.8, 64)
+        (8, 8)
+
+    Args:
+
+        threshold (float): a Jaccard similarity threshold, between 0 and 1
+        num_perm (int): a signature length
+        key (callable): converts a tag to a comparison key
+
+    Returns:
+
+        a tuple containing a band count and a row count per band
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+def hash_tags(tag_lists, key=str.lower):
+    """
+    Converts tag lists to a flat array of 32-bit tag hashes.
+    Tags are compared by their keys, repeated tags are counted once.
+
+    Args:
+
+        tag_lists (list): a list of tag lists
+        key (callable): converts a tag to a comparison key, lowercase by default
+
+    Returns:
+
+        a tuple containing a flat :code:`uint64` hash array
+        and an array of tag counts per prompt
+    """
+    hashes = []
+    lengths = np.zeros(len(tag_lists), dtype=np.int64)
+    for index, tags in enumerate(tag_lists):
+        tag_hashes = {crc32(key(tag).encode('utf-8')) for tag in tags}
+        hashes.extend(tag_hashes)
+        lengths[index] = len(tag_hashes)
+    return np.array(hashes, dtype=np.uint64), lengths
+
+def minhash_signatures(tag_lists, num_perm=64, seed=1, key=str.lower):
+    """
+    Computes MinHash signatures for the tag lists.
+
+    Uses a multiply-shift hash family, the permutations are evaluated
+    for all the tags in a chunk at once and reduced per prompt.
+    Prompts without tags get a signature of maximum values.
+
+    Args:
+
+        tag_lists (list): a list of tag lists
+        num_perm (int): a signature length
+        seed (int): a random seed for the hash family
+        key (callable): converts a tag to a comparison key
+
+    Returns:
+
+        a :code:`uint32` NumPy array shaped :code:`(len(tag_lists), num_perm)`
+    """
+    rng = np.random.default_rng(seed)
+    # Odd multipliers and arbitrary offsets, uint64 arithmetic wraps around
+    mul = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    add = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    signatures = np.full((len(tag_lists), num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    for start in range(0, len(tag_lists), CHUNK_SIZE):
+        hashes, lengths = hash_tags(tag_lists[start:start + CHUNK_SIZE], key)
+        if not len(hashes):
+            continue
+        # Permuted hashes for every tag: (num_perm, tag count),
+        # contiguous rows keep the per-prompt reduction fast
+        permuted = ((mul[:, None] * hashes + add[:, None]) >> np.uint64(32)).astype(np.uint32)
+        # Reduce the tags of each non-empty prompt
+        non_empty = np.flatnonzero(lengths)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))[non_empty]
+        signatures[start + non_empty] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    return signatures
+
+def cluster_near_duplicates(tag_lists, threshold=0.8, num_perm=64, key=str.lower):
+    """
+    Groups prompts with similar tag sets.
+
+    Candidates are prompts sharing at least one LSH band,
+    each candidate pair is verified by the estimated Jaccard similarity
+    (a share of equal signature values).
+
+    Example:
+
+        >>> from lib.dedup import cluster_near_duplicates
+        >>> cluster_near_duplicates([
+        ...     ['vray', 'HDR', 'DSLR', 'closeup', 'PBR'],
+        ...     ['vray', 'HDR', 'DSLR', 'closeup', 'PBR', 'bokeh'],
+        ...     ['oil painting', 'impressionism']
+        ... ])
+        array([0, 0, 2])
+
+    Args:
+
+        tag_lists (list): a list of tag lists
+        threshold (float): a Jaccard similarity threshold, between 0 and 1
+        num_perm (int): a signature length
+        key (callable): converts a tag to a comparison key
+
+    Returns:
+
+        an integer NumPy array with a cluster label for each prompt,
+        a label is the smallest prompt index in a cluster
+    """
+    bands, rows = lsh_params(threshold, num_perm)
+    signatures = minhash_signatures(tag_lists, num_perm, key=key)
+    has_tags = signatures[:, 0] != np.iinfo(np.uint32).max
+    labels = np.arange(len(tag_lists))
+    sources = []
+    targets = []
+    members = np.flatnonzero(has_tags)
+    for band in range(bands):
+        # Fold each band into a single 64-bit bucket key,
+        # key collisions only add candidates that fail the verification
+        band_keys = np.zeros(len(members), dtype=np.uint64)
+        for column in signatures[members, band * rows:(band + 1) * rows].T:
+            band_keys = band_keys * np.uint64(0x100000001B3) ^ column.astype(np.uint64)
+        _, first, inverse = np.unique(band_keys, return_index=True, return_inverse=True)
+        # Link each bucket member to the first member of the bucket
+        heads = members[first[inverse.ravel()]]
+        linked = heads != members
+        sources.append(members[linked])
+        targets.append(heads[linked])
+    if not sources:
+        return labels
+    # Remove pairs found by several bands
+    pairs = np.unique(np.concatenate(sources) * len(labels) + np.concatenate(targets))
+    sources, targets = pairs // len(labels), pairs % len(labels)
+    # Verify candidates by the estimated similarity, chunked to bound the memory
+    verified = np.zeros(len(pairs), dtype=bool)
+    for start in range(0, len(pairs), CHUNK_SIZE):
+        end = start + CHUNK_SIZE
+        similarity = (signatures[sources[start:end]] == signatures[targets[start:end]]).mean(axis=1)
+        verified[start:end] = similarity >= threshold
+    sources = sources[verified]
+    targets = targets[verified]
+    # Propagate the smallest label through the verified edges
+    while True:
+        previous = labels.copy()
+        np.minimum.at(labels, sources, labels[targets])
+        np.minimum.at(labels, targets, labels[sources])
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            break
+    return labels
+
+def collapse_near_duplicates(prompts, tag_lists, threshold=0.8, num_perm=64, key=str.lower):
+    """
+    Keeps a single prompt per near-duplicate cluster:
+    the first one in the input order.
+
+    Args:
+
+        prompts (list): a list of prompt strings
+        tag_lists (list): a list of tag lists, one for each prompt
+        threshold (float): a Jaccard similarity threshold, between 0 and 1
+        num_perm (int): a signature length
+        key (callable): converts a tag to a comparison key
+
+    Returns:
+
+        a tuple with the lists of kept prompts and their tag lists
+    """
+    labels = cluster_near_duplicates(tag_lists, threshold, num_perm, key)
+    keep = np.flatnonzero(labels == np.arange(len(labels)))
+    return [prompts[i] for i in keep], [tag_lists[i] for i in keep]
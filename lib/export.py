@@ -0,0 +1,185 @@
+"""
+Contains functions to export tag and edge tables in columnar formats.
+
+Two tables are written to an output directory:
+
+* :code:`tags`: "id", "name", "count" and "rank" columns
+* :code:`edges`: "src", "dst", "count" and "weight" columns, "src" and "dst" are tag IDs
+
+A posting index (see :code:`lib.index`) is saved next to them,
+with a :code:`prompts.txt` file: line N contains the prompt with ID N.
+
+Supported formats are Parquet and Arrow IPC (Feather v2) with dictionary-encoded names,
+those require the :code:`pyarrow` package.
+Without it, each column is saved as a separate :code:`.npy` file
+(:code:`tags.id.npy`, :code:`edges.src.npy`, etc.), which can be memory-mapped with
+:code:`numpy.load(path, mmap_mode='r')`.
+
+Tag names and ranks of an exported table can be loaded back with :code:`load_ranks`,
+e.g. to start iterative rank modes from a previous run.
+"""
+
+from os import makedirs
+from os.path import join, isfile
+import numpy as np
+
+TABLE_FORMATS = ['parquet', 'arrow', 'npy']
+
+def import_pyarrow():
+    """
+    Imports :code:`pyarrow` on demand, so it's only loaded when a table is written.
+
+    Returns:
+
+        a tuple of :code:`pyarrow`, :code:`pyarrow.parquet` and :code:`pyarrow.feather` modules,
+        None if :code:`pyarrow` is not installed
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.feather
+    except ImportError:
+        return None
+    return pyarrow, pyarrow.parquet, pyarrow.feather
+
+def tag_columns(tp):
+    """
+    Args:
+
+        tp (Tag_processor): instance of a Tag_processor
+
+    Returns:
+
+        a dict with "id", "name", "count" and "rank" columns as NumPy arrays
+    """
+    tag_list = tp.get_tag_list()
+    return {
+        'id': np.array([tag['id'] for tag in tag_list], dtype=np.int32),
+        'name': np.array([tag['name'] for tag in tag_list], dtype=np.str_),
+        'count': np.array([tp.tag_dict[ tp.tag_list[tag['id']] ] for tag in tag_list], dtype=np.int64),
+        'rank': np.array([tag['rank'] for tag in tag_list], dtype=np.float64)
+    }
+
+def edge_columns(pmgr):
+    """
+    Args:
+
+        pmgr (Pair_mgr): instance of Pair_mgr
+
+    Returns:
+
+        a dict with "src", "dst", "count" and "weight" columns as NumPy arrays
+    """
+    src, dst, counts = pmgr.get_arrays()
+    return {
+        'src': src,
+        'dst': dst,
+        'count': counts,
+        'weight': counts / max(pmgr.get_edge_count(), 1)
+    }
+
+def write_table(columns, path, table_format, arrow=None):
+    """
+    Writes a table to a file (or a set of files for the "npy" format).
+
+    Args:
+
+        columns (dict): NumPy arrays, one for each column
+        path (str): an output path without an extension
+        table_format (str): "parquet", "arrow" or "npy"
+        arrow (tuple): modules from :code:`import_pyarrow`, required by "parquet" and "arrow" formats
+    """
+    if table_format == 'npy':
+        for name, column in columns.items():
+            np.save('{}.{}.npy'.format(path, name), column)
+        return
+    pa, pq, feather = arrow
+    table = pa.table({
+        name: pa.array(column).dictionary_encode() if column.dtype.kind == 'U' else pa.array(column)
+        for name, column in columns.items()
+    })
+    if table_format == 'parquet':
+        pq.write_table(table, path + '.parquet')
+    else:
+        feather.write_feather(table, path + '.arrow', compression='uncompressed')
+
+def export_tables(tp, pmgr, output_dir, table_format='parquet', index=None, prompts=None):
+    """
+    Exports the tag and edge tables to a directory.
+    Falls back to the "npy" format if :code:`pyarrow` is not installed.
+    A posting index, if provided, is saved as :code:`postings.npz`,
+    prompts, if provided, are saved as :code:`prompts.txt`, one per line, in the prompt ID order.
+
+    Example:
+
+        >>> export_tables(tp, pmgr, './tables')
+
+    Args:
+
+        tp (Tag_processor): instance of a Tag_processor
+        pmgr (Pair_mgr): instance of Pair_mgr
+        output_dir (str): an output directory, created if it doesn't exist
+        table_format (str): "parquet", "arrow" or "npy"
+        index (Posting_index): a tag to prompt index
+        prompts (list): indexed prompts, in the same order as those were added to the index
+
+    Returns:
+
+        a format used
+    """
+    if table_format not in TABLE_FORMATS:
+        raise ValueError('Unknown table format: {}'.format(table_format))
+    arrow = import_pyarrow() if table_format != 'npy' else None
+    if arrow is None and table_format != 'npy':
+        print('Warning: pyarrow is not installed, using the "npy" format')
+        table_format = 'npy'
+    makedirs(output_dir, exist_ok=True)
+    write_table(tag_columns(tp), join(output_dir, 'tags'), table_format, arrow)
+    write_table(edge_columns(pmgr), join(output_dir, 'edges'), table_format, arrow)
+    if index is not None:
+        index.save(join(output_dir, 'postings.npz'))
+    if prompts is not None:
+        with open(join(output_dir, 'prompts.txt'), 'w', encoding='utf-8') as prompts_file:
+            for prompt in prompts:
+                prompts_file.write(prompt + '\n')
+    return table_format
+
+def load_ranks(input_dir):
+    """
+    Loads tag names and ranks from a directory with a tag table written by :code:`export_tables`,
+    in any of the supported formats.
+
+    Example:
+
+        >>> previous = load_ranks('./tables')
+
+    Args:
+
+        input_dir (str): a directory with a tag table
+
+    Returns:
+
+        a dict associating tag names with ranks
+
+    Raises:
+
+        FileNotFoundError: if there's no tag table in a directory
+        ImportError: if a table requires :code:`pyarrow`, which is not installed
+    """
+    path = join(input_dir, 'tags')
+    if isfile(path + '.name.npy') and isfile(path + '.rank.npy'):
+        names = np.load(path + '.name.npy').tolist()
+        ranks = np.load(path + '.rank.npy').tolist()
+        return dict(zip(names, ranks))
+    for table_format in ['parquet', 'arrow']:
+        if isfile('{}.{}'.format(path, table_format)):
+            arrow = import_pyarrow()
+            if arrow is None:
+                raise ImportError('pyarrow is required to read {}.{}'.format(path, table_format))
+            pa, pq, feather = arrow
+            if table_format == 'parquet':
+                table = pq.read_table(path + '.parquet', columns=['name', 'rank'])
+            else:
+                table = feather.read_table(path + '.arrow', columns=['name', 'rank'])
+            return dict(zip(table.column('name').to_pylist(), table.column('rank').to_pylist()))
+    raise FileNotFoundError('No tag table found in {}'.format(input_dir))
@@ -7,6 +7,7 @@ Todo:
 """
 
 from re import compile as re_compile
+from .prompts import prompt_split
 
 def parse_number_filter(in_str):
     """
@@ -44,3 +45,28 @@ def parse_number_filter(in_str):
         if result['condition'] == '==':
             result['condition'] = '='
     return result
+
+def parse_query(in_str):
+    """
+    Parses tag queries like "vray ; HDR ; !closeup",
+    tags are delimited like prompt tags, a "!" prefix excludes a tag.
+
+    Returns:
+
+        A dict containing "include" and "exclude" lists of tag names.
+
+    Example:
+
+        >>> from lib.filtering import parse_query
+        >>> parse_query('vray ; HDR ; ! closeup')
+        {'include': ['vray', 'HDR'], 'exclude': ['closeup']}
+    """
+    result = {'include': [], 'exclude': []}
+    for tag in filter(None, prompt_split(in_str)):
+        if tag.startswith('!'):
+            tag = tag[1:].strip()
+            if tag:
+                result['exclude'].append(tag)
+        else:
+            result['include'].append(tag)
+    return result
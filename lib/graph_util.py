@@ -5,6 +5,7 @@ Graph-related utility functions for CLIP neural network tags.
 from itertools import permutations
 from collections import defaultdict
 from networkx import Graph
+import numpy as np
 
 def build_graph(tp, pmgr):
     """
@@ -19,17 +20,29 @@ def build_graph(tp, pmgr):
     Returns:
 
         NetworkX Graph instance 
+
+    Example:
+
+        >>> from lib.tags import Tag_processor
+        >>> from lib.graph_util import Pair_mgr, build_graph
+        >>> tp = Tag_processor()
+        >>> pmgr = Pair_mgr()
+        >>> pmgr.push_tag_numbers(tp.put_tags(['vray', 'HDR', 'DSLR']))
+        >>> G = build_graph(tp, pmgr)
+        >>> list(G.nodes)
+        [0, 1, 2]
+        >>> list(G.edges)
+        [(0, 1), (0, 2), (1, 2)]
     """
     # Prepare a graph
     G = Graph()
     # Fill graph nodes
     for current_tag in tp.get_tag_list():
         G.add_node(current_tag['id'], name=current_tag['name'], rank=current_tag['rank'])
-    # Fill graph edges
-    for item in pmgr.get_list():
-        G.add_edges_from([
-            (item['edge'][0], item['edge'][1], {'weight': item['weight']})
-        ])
+    # Fill graph edges, using the same integer IDs as the nodes
+    src, dst, counts = pmgr.get_arrays()
+    weights = counts / max(pmgr.get_edge_count(), 1)
+    G.add_weighted_edges_from(zip(src.tolist(), dst.tolist(), weights.tolist()))
     # Return the graph
     return G
 
@@ -152,6 +165,27 @@ class Pair_mgr:
         """
         return len(self.pairs.keys())
 
+    def get_arrays(self):
+        """
+        Returns:
+
+            a tuple of NumPy arrays: source tag IDs, destination tag IDs and pair counts
+
+        Example:
+
+            >>> pmgr = Pair_mgr()
+            >>> pmgr.push_pair((0, 1))
+            >>> pmgr.push_pair((0, 1))
+            >>> pmgr.push_pair((1, 2))
+            >>> pmgr.get_arrays()
+            (array([0, 1], dtype=int32), array([1, 2], dtype=int32), array([2, 1]))
+        """
+        edges = np.array(
+            [key.split(' ') for key in self.pairs.keys()], dtype=np.int32
+        ).reshape(-1, 2)
+        counts = np.fromiter(self.pairs.values(), dtype=np.int64, count=len(self.pairs))
+        return edges[:, 0], edges[:, 1], counts
+
     def get_list(self):
         """
         Returns:
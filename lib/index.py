@@ -0,0 +1,206 @@
+"""
+Contains an inverted index that associates tag IDs
+with sorted IDs of the prompts containing them.
+
+It is filled during ingest and allows boolean tag queries,
+like "prompts containing :code:`vray` and :code:`HDR`, but not :code:`closeup`",
+by intersecting the posting lists.
+
+Only the tag IDs of each prompt are stored while the index is filled,
+in flat arrays, as a prompt to tag table.
+Posting lists are built from that table when the first query is made,
+so there's no second per-prompt copy of the tags in memory.
+
+The index is saved as a compressed NumPy archive:
+posting lists are delta-encoded and concatenated, with an offset array
+pointing to the start of each tag's list. The prompt to tag table is saved too,
+so a loaded index can be queried and matching prompts can be recounted.
+"""
+
+from array import array
+import numpy as np
+
+class Posting_index:
+    """
+    Stores a sorted list of prompt IDs for each tag ID.
+
+    Example:
+
+        >>> from lib.index import Posting_index
+        >>> index = Posting_index()
+        >>> index.push_prompt([0, 1, 2])
+        0
+        >>> index.push_prompt([0, 2])
+        1
+        >>> index.push_prompt([1, 2])
+        2
+        >>> index.query([0, 2])
+        array([0, 1])
+        >>> index.query([2], exclude=[1])
+        array([1])
+        >>> index.get_prompt_tags(1)
+        [0, 2]
+
+    Attributes:
+
+        prompt_tags (array.array): tag IDs of all the prompts, concatenated
+        prompt_offsets (array.array): a start of each prompt's tags in :code:`prompt_tags`,
+            followed by the total length
+        prompt_count (int): a count of all prompts added
+    """
+
+    def __init__(self):
+        # Tag IDs of each prompt, in the prompt order
+        self.prompt_tags = array('I')
+        self.prompt_offsets = array('Q', [0])
+        # Used to enumerate the prompts
+        self.prompt_count = 0
+        # Posting lists, built on demand: concatenated prompt IDs and per-tag offsets
+        self.posting_values = None
+        self.posting_offsets = None
+
+    def push_prompt(self, tag_numbers):
+        """
+        Adds a prompt to the index.
+
+        Args:
+
+            tag_numbers (list): a list of tag IDs a prompt contains
+
+        Returns:
+
+            a prompt ID
+        """
+        prompt_id = self.prompt_count
+        self.prompt_tags.extend(tag_numbers)
+        self.prompt_offsets.append(len(self.prompt_tags))
+        self.prompt_count += 1
+        # Posting lists are outdated now
+        self.posting_values = None
+        return prompt_id
+
+    def get_prompt_tags(self, prompt_id):
+        """
+        Args:
+
+            prompt_id (int): a prompt ID
+
+        Returns:
+
+            a list of tag IDs of a prompt, as those were added
+        """
+        return self.prompt_tags[self.prompt_offsets[prompt_id]:self.prompt_offsets[prompt_id + 1]].tolist()
+
+    def build_postings(self):
+        """
+        Builds posting lists from the prompt to tag table.
+        A tag repeated in a prompt is listed once.
+        """
+        tags = np.frombuffer(self.prompt_tags, dtype=np.uint32).astype(np.int64)
+        lengths = np.diff(np.frombuffer(self.prompt_offsets, dtype=np.uint64).astype(np.int64))
+        prompts = np.repeat(np.arange(self.prompt_count, dtype=np.int64), lengths)
+        # Sort by tag, then by prompt, removing repeated tags
+        keys = np.unique(tags * max(self.prompt_count, 1) + prompts)
+        tag_count = int(tags.max()) + 1 if len(tags) else 0
+        self.posting_values = keys % max(self.prompt_count, 1)
+        self.posting_offsets = np.searchsorted(
+            keys // max(self.prompt_count, 1), np.arange(tag_count + 1)
+        )
+
+    def get_postings(self, tag_number):
+        """
+        Args:
+
+            tag_number (int): a tag ID
+
+        Returns:
+
+            a sorted NumPy array of prompt IDs containing a tag
+        """
+        if self.posting_values is None:
+            self.build_postings()
+        if not 0 <= tag_number < len(self.posting_offsets) - 1:
+            return np.zeros(0, dtype=np.int64)
+        return self.posting_values[self.posting_offsets[tag_number]:self.posting_offsets[tag_number + 1]]
+
+    def query(self, include, exclude=()):
+        """
+        Finds prompts containing all the included tags and none of the excluded ones.
+        Posting lists are intersected from the shortest one.
+
+        Args:
+
+            include (list): tag IDs that must be present, an unknown tag should be passed as None
+            exclude (list): tag IDs that must be absent
+
+        Returns:
+
+            a sorted NumPy array of prompt IDs
+        """
+        if None in include:
+            return np.zeros(0, dtype=np.int64)
+        if include:
+            lists = sorted((self.get_postings(tag) for tag in include), key=len)
+            result = lists[0]
+            for postings in lists[1:]:
+                result = np.intersect1d(result, postings, assume_unique=True)
+        else:
+            result = np.arange(self.prompt_count)
+        for tag in exclude:
+            if tag is not None:
+                result = np.setdiff1d(result, self.get_postings(tag), assume_unique=True)
+        return result
+
+    def save(self, path):
+        """
+        Saves the index as a compressed NumPy archive
+        with "offsets", "deltas" and "prompt_count" arrays,
+        and a prompt to tag table in "prompt_offsets" and "prompt_tags" arrays.
+
+        Args:
+
+            path (str): an output file path
+        """
+        if self.posting_values is None:
+            self.build_postings()
+        offsets = self.posting_offsets
+        deltas = np.diff(self.posting_values, prepend=0)
+        # The first value of each list is stored as is
+        starts = offsets[:-1][np.diff(offsets) > 0]
+        deltas[starts] = self.posting_values[starts]
+        np.savez_compressed(
+            path,
+            offsets=offsets,
+            deltas=deltas.astype(np.uint32),
+            prompt_count=self.prompt_count,
+            prompt_offsets=np.frombuffer(self.prompt_offsets, dtype=np.uint64),
+            prompt_tags=np.frombuffer(self.prompt_tags, dtype=np.uint32)
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an index saved by :code:`save`.
+
+        Args:
+
+            path (str): an input file path
+
+        Returns:
+
+            a Posting_index instance
+        """
+        index = cls()
+        with np.load(path) as data:
+            offsets = data['offsets']
+            sums = np.cumsum(data['deltas'], dtype=np.int64)
+            index.prompt_count = int(data['prompt_count'])
+            index.prompt_offsets = array('Q', data['prompt_offsets'].astype(np.uint64).tobytes())
+            index.prompt_tags = array('I', data['prompt_tags'].astype(np.uint32).tobytes())
+        # Undo the delta encoding: subtract the sum of previous lists from each list
+        lengths = np.diff(offsets)
+        starts = offsets[:-1]
+        previous = np.where(starts > 0, sums[np.maximum(starts - 1, 0)], 0)
+        index.posting_values = sums - np.repeat(previous, lengths)
+        index.posting_offsets = offsets
+        return index
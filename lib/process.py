@@ -3,8 +3,11 @@ Contains an entry-point function to.
 Provided the command-line arguments, it can:
 
 * Sort and filter CLIP tags
+* Restrict counting to prompts matching a tag query
 * Display tags as a NetworkX graph
 * Export a NetworkX graph as JSON
+* Export tag and edge tables in columnar formats
+* Export a graph as multi-resolution tiles for web visualization
 """
 
 # Required by tag counter
@@ -12,12 +15,20 @@ import operator as op
 # Required by tag counter and graph builder
 from lib.prompts import load_prompts
 from lib.tags import extract_tags, Tag_processor
+from lib.canon import Tag_canonicalizer, load_aliases
+from lib.dedup import collapse_near_duplicates
+from lib.index import Posting_index
 # Required by graph builder
 from lib.graph_util import Pair_mgr, build_graph
+from lib.rank import calculate_ranks, initial_ranks
 from lib.plot import plot_graph, plot_graph_basic
 # Required by graph export tool
 from networkx.readwrite import json_graph
 from json import dump
+# Required by table export tool
+from lib.export import export_tables, load_ranks
+# Required by tile export tool
+from lib.tiles import export_tiles
 
 OPERATORS = {
     '>': op.gt,
@@ -27,6 +38,9 @@ OPERATORS = {
     '=': op.eq
 }
 
+# Modes that need tag pairs
+PAIR_MODES = ['display_graph', 'export_graph', 'export_tables', 'export_tiles']
+
 def process_dir(args):
     """
     An entry-point function.
@@ -35,26 +49,62 @@ def process_dir(args):
 
         args (argparse.Namespace): an object containing the parsed argumentss
     """
+    # Initialize a tag canonicalizer if tag variants should be merged
+    canonicalizer = None
+    aliases = load_aliases(args.aliases) if 'aliases' in args and args.aliases is not None else None
+    fuzzy = 'fuzzy_tags' in args and args.fuzzy_tags
+    if aliases is not None or fuzzy:
+        canonicalizer = Tag_canonicalizer(aliases, fuzzy=fuzzy)
     # Initialize a tag processor
-    tp = Tag_processor()
+    tp = Tag_processor(canonicalizer)
     # Initialize a pair manager
-    pmgr = Pair_mgr() if args.mode in ['display_graph', 'export_graph'] else None
+    pmgr = Pair_mgr() if args.mode in PAIR_MODES else None
     # Prompts to scan
-    prompts = load_prompts(args.path)
+    prompts = load_prompts(args.path, args.workers if 'workers' in args else None)
+    if 'dedup_threshold' in args and args.dedup_threshold is not None:
+        # Collapse near-duplicate prompts so they don't inflate the counts,
+        # tags are compared with aliases applied
+        key = canonicalizer.base_key if canonicalizer is not None else str.lower
+        tag_lists = [extract_tags(prompt) for prompt in prompts]
+        prompts, tag_lists = collapse_near_duplicates(prompts, tag_lists, args.dedup_threshold, key=key)
+    else:
+        # Extract tags one prompt at a time
+        tag_lists = (extract_tags(prompt) for prompt in prompts)
+    # Initialize a posting index for tag queries and table export
+    query = args.query if 'query' in args else None
+    index = Posting_index() if query is not None or args.mode == 'export_tables' else None
     # Iterate all available prompts
-    for prompt in prompts:
-        # Extract a list of tags
-        tags = extract_tags(prompt)
-        if args.mode in ['display_graph', 'export_graph']:
+    for tags in tag_lists:
+        if args.mode in PAIR_MODES or index is not None:
             # Add tags to Tag_processor,
             # get number for each added tag
             tag_numbers = tp.put_tags(tags)
-            # Update the Pair_mgr
-            pmgr.push_tag_numbers(tag_numbers)
+            if index is not None:
+                # Update the posting index
+                index.push_prompt(tag_numbers)
+            if args.mode in PAIR_MODES and query is None:
+                # Update the Pair_mgr
+                pmgr.push_tag_numbers(tag_numbers)
         else:
             # Add tags to the Tag_processor
             tp.add_tags(tags)
-    if args.mode in ['display_graph', 'export_graph']:
+    if query is not None:
+        # Find prompts matching a query, e.g. "vray ; HDR ; !closeup"
+        include = [tp.get_tag_id(tag) for tag in query['include']]
+        exclude = [tp.get_tag_id(tag) for tag in query['exclude']]
+        # Count only the matching prompts
+        tp.reset_counts()
+        for prompt_id in index.query(include, exclude):
+            tag_numbers = index.get_prompt_tags(prompt_id)
+            tp.count_tag_numbers(tag_numbers)
+            if args.mode in PAIR_MODES:
+                pmgr.push_tag_numbers(tag_numbers)
+    if pmgr is not None and 'rank_mode' in args and args.rank_mode != 'frequency':
+        # Replace frequency ranks with centrality ones
+        # Previous ranks are matched by tag names, tag IDs differ between runs
+        initial = initial_ranks(tp, load_ranks(args.rank_init)) if args.rank_init is not None else None
+        tp.set_ranks(calculate_ranks(tp, pmgr, args.rank_mode, args.rank_tol, initial=initial))
+    if args.mode in ['display_graph', 'export_graph', 'export_tiles']:
         # Build a NetworkX graph
         G = build_graph(tp, pmgr)
     elif args.mode == 'count_tags':
@@ -75,3 +125,12 @@ def process_dir(args):
         node_link_data['nodes'] = [node for node in node_link_data['nodes'] if 'name' in node]
         # TODO check it's possible to create a file
         dump(node_link_data, args.output_file, indent=4, ensure_ascii=False)
+    if args.mode == 'export_tables':
+        # Write tag and edge tables
+        export_tables(tp, pmgr, args.output_dir, args.table_format, index, prompts)
+    if args.mode == 'export_tiles':
+        # Write zoom level tiles and a manifest
+        export_tiles(
+            G, args.output_dir, args.nodes_per_tile, args.edges_per_tile,
+            args.layout, args.layout_iterations
+        )
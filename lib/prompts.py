@@ -1,15 +1,90 @@
 """
 Contains a function to load prompts from available files.
+
+Files compressed with gzip (:code:`.gz`), xz (:code:`.xz`, :code:`.lzma`),
+bzip2 (:code:`.bz2`) or Zstandard (:code:`.zst`) are decompressed while streaming,
+several files at once, in a thread pool.
+Zstandard support requires the :code:`zstandard` package.
 """
 
-from os import listdir
+from os import listdir, cpu_count
 from os.path import isfile, join, abspath
 from re import split
+from io import TextIOWrapper
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import lzma
+import bz2
+
+def open_zstd(file_path):
+    """
+    Opens a Zstandard-compressed file for binary reading.
+
+    Args:
+
+        file_path (str): a path to a compressed file
+
+    Raises:
 
-def load_prompts(dir_path):
+        ImportError: if the :code:`zstandard` package is not installed
+    """
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('The "zstandard" package is required to read {}'.format(file_path))
+    return zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
+
+def open_plain(file_path):
+    """
+    Opens an uncompressed file for binary reading.
+
+    Args:
+
+        file_path (str): a path to a file
+    """
+    return open(file_path, 'rb')
+
+# Binary file openers for each supported file extension
+OPENERS = {
+    '.gz': gzip.open,
+    '.xz': lzma.open,
+    '.lzma': lzma.open,
+    '.bz2': bz2.open,
+    '.zst': open_zstd
+}
+
+def read_prompt_file(file_path):
+    """
+    Reads a prompt file line by line, decompresses it while streaming
+    if its extension is known. Empty lines are skipped.
+
+    Args:
+
+        file_path (str): a path to a prompt file
+
+    Returns:
+
+        a set of unique lines of a file
+    """
+    opener = open_plain
+    for extension, extension_opener in OPENERS.items():
+        if file_path.endswith(extension):
+            opener = extension_opener
+            break
+    rows = set()
+    with TextIOWrapper(opener(file_path), encoding='utf-8') as prompts_file:
+        for line in prompts_file:
+            line = line.rstrip('\r\n')
+            if line.strip():
+                rows.add(line)
+    return rows
+
+def load_prompts(dir_path, workers=None):
     """
     Looks up a directory path, takes a full path for it,
     lists for directory contents and loads all available prompts.
+    Files are read in a thread pool, compressed files are decompressed on the fly.
 
     Example:
 
@@ -25,26 +100,30 @@ def load_prompts(dir_path):
     Args:
 
         dir_path (str): a path to the prompt directory
+        workers (int): a number of threads reading the files and of files read at once, picked by Python if not set
 
     Returns:
 
         a list of strings containing CLIP prompts
     """
-    rows = ""
+    rows = set()
     # Build a file list
     file_list = [join(dir_path, f) for f in listdir(dir_path) if isfile(join(dir_path, f))]
-    # Load prompts from a file
-    for file_path in file_list:
-        # Load a file
-        with open(file_path, 'r') as prompts_file:
-            rows += prompts_file.read().strip()
-            rows += "\n"
-    # Remove the last endline
-    rows = rows.strip()
-    # Remove duplicates and sort
-    result = sorted(
-        list(set(rows.splitlines()))
-    )
+    # The same default as ThreadPoolExecutor uses
+    if workers is None:
+        workers = min(32, (cpu_count() or 1) + 4)
+    # Load prompts from the files, removing duplicates as the files arrive
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Keep only a few files in flight to bound the memory use
+        in_flight = deque()
+        for file_path in file_list:
+            if len(in_flight) >= workers:
+                rows.update(in_flight.popleft().result())
+            in_flight.append(executor.submit(read_prompt_file, file_path))
+        while in_flight:
+            rows.update(in_flight.popleft().result())
+    # Sort
+    result = sorted(rows)
     return result
 
 def prompt_split(prompt, maxsplit=0):
@@ -0,0 +1,232 @@
+"""
+Contains tag rank calculations based on the co-occurence graph,
+an alternative to the frequency rank of :code:`Tag_processor.get_tag_rank`.
+
+Supported modes:
+
+* :code:`frequency`: a tag count divided by the global tag count (default)
+* :code:`pagerank`: weighted PageRank
+* :code:`eigenvector`: eigenvector centrality
+* :code:`pmi_degree`: a sum of positive pointwise mutual information over tag neighbours,
+  generic tags that co-occur with everything get low values
+
+PageRank and eigenvector centrality are calculated by power iteration,
+sparse matrix-vector products are done with :code:`numpy.bincount`
+over the pair arrays from :code:`Pair_mgr`, so no dense matrix is built.
+All the ranks are normalized to sum to 1.
+Iterative modes can start from ranks of a previous run, matched by tag names.
+"""
+
+import numpy as np
+
+RANK_MODES = ['frequency', 'pagerank', 'eigenvector', 'pmi_degree']
+
+def spmv(src, dst, weights, x):
+    """
+    Multiplies a symmetric sparse matrix, given by its upper triangle, by a vector.
+    Diagonal values (self-loops from repeated tags) are counted once.
+
+    Example:
+
+        >>> import numpy as np
+        >>> from lib.rank import spmv
+        >>> spmv(np.array([0, 1]), np.array([1, 2]), np.array([2., 1.]), np.ones(3))
+        array([2., 3., 1.])
+
+    Args:
+
+        src (numpy.ndarray): row indices
+        dst (numpy.ndarray): column indices
+        weights (numpy.ndarray): matrix values
+        x (numpy.ndarray): a vector
+
+    Returns:
+
+        a product vector
+    """
+    return (
+        np.bincount(src, weights=weights * x[dst], minlength=len(x)) +
+        np.bincount(dst, weights=np.where(src != dst, weights, 0.0) * x[src], minlength=len(x))
+    )
+
+def start_vector(size, initial):
+    """
+    Prepares a starting vector for power iteration.
+    Tags missing from a previous run (NaN values) start from the mean of the known values.
+
+    Example:
+
+        >>> import numpy as np
+        >>> from lib.rank import start_vector
+        >>> start_vector(3, np.array([0.2, np.nan, 0.6]))
+        array([0.16666667, 0.33333333, 0.5       ])
+
+    Args:
+
+        size (int): a tag count
+        initial (numpy.ndarray): previous ranks indexed by tag IDs or None
+
+    Returns:
+
+        a vector that sums to 1
+
+    Raises:
+
+        ValueError: if a previous rank vector doesn't have a value for each tag ID
+    """
+    if initial is None:
+        x = np.ones(size)
+    else:
+        if len(initial) != size:
+            raise ValueError('Expected {} initial ranks, got {}'.format(size, len(initial)))
+        x = np.asarray(initial, dtype=np.float64).copy()
+        known = ~np.isnan(x)
+        x[~known] = x[known].mean() if known.any() else 1.0
+    if x.sum() <= 0:
+        x = np.ones(size)
+    return x / x.sum()
+
+def initial_ranks(tp, previous):
+    """
+    Maps previous ranks to the current tag IDs by tag names,
+    since tag IDs change when prompts are added.
+
+    Args:
+
+        tp (Tag_processor): instance of a Tag_processor
+        previous (dict): associates tag names with previous ranks
+
+    Returns:
+
+        a rank vector indexed by tag IDs, NaN for new tags
+    """
+    x = np.full(len(tp.tag_list), np.nan)
+    for name, rank in previous.items():
+        tag_id = tp.get_tag_id(name)
+        if tag_id is not None:
+            x[tag_id] = rank
+    return x
+
+def pagerank(src, dst, weights, size, damping=0.85, tol=1e-6, max_iter=100, initial=None):
+    """
+    Calculates a weighted PageRank of an undirected graph.
+    Nodes without edges spread their rank uniformly.
+
+    Args:
+
+        src (numpy.ndarray): edge source IDs
+        dst (numpy.ndarray): edge destination IDs
+        weights (numpy.ndarray): edge weights
+        size (int): a node count
+        damping (float): a damping factor
+        tol (float): a tolerance, L1 norm of a change between iterations
+        max_iter (int): a maximum iteration count
+        initial (numpy.ndarray): previous ranks indexed by tag IDs for a warm start, see :code:`initial_ranks`
+
+    Returns:
+
+        a rank vector
+    """
+    strength = spmv(src, dst, weights, np.ones(size))
+    dangling = strength == 0
+    inverse_strength = np.divide(1.0, strength, out=np.zeros(size), where=~dangling)
+    x = start_vector(size, initial)
+    for _ in range(max_iter):
+        previous = x
+        x = damping * spmv(src, dst, weights, x * inverse_strength)
+        x += (1.0 - damping + damping * previous[dangling].sum()) / size
+        if np.abs(x - previous).sum() < tol:
+            break
+    else:
+        print('Warning: PageRank did not converge in {} iterations'.format(max_iter))
+    return x / x.sum()
+
+def eigenvector_centrality(src, dst, weights, size, tol=1e-6, max_iter=100, initial=None):
+    """
+    Calculates eigenvector centrality.
+    Iterates :code:`(A + I) x` to avoid oscillation on bipartite components.
+
+    Args:
+
+        src (numpy.ndarray): edge source IDs
+        dst (numpy.ndarray): edge destination IDs
+        weights (numpy.ndarray): edge weights
+        size (int): a node count
+        tol (float): a tolerance, L1 norm of a change between iterations
+        max_iter (int): a maximum iteration count
+        initial (numpy.ndarray): previous ranks indexed by tag IDs for a warm start, see :code:`initial_ranks`
+
+    Returns:
+
+        a rank vector
+    """
+    x = start_vector(size, initial)
+    for _ in range(max_iter):
+        previous = x
+        x = x + spmv(src, dst, weights, x)
+        x /= x.sum()
+        if np.abs(x - previous).sum() < tol:
+            break
+    else:
+        print('Warning: eigenvector centrality did not converge in {} iterations'.format(max_iter))
+    return x
+
+def pmi_degree(src, dst, counts, tag_counts):
+    """
+    Calculates a sum of positive pointwise mutual information over tag neighbours.
+
+    Args:
+
+        src (numpy.ndarray): edge source IDs
+        dst (numpy.ndarray): edge destination IDs
+        counts (numpy.ndarray): pair counts
+        tag_counts (numpy.ndarray): tag counts
+
+    Returns:
+
+        a rank vector
+    """
+    size = len(tag_counts)
+    tag_p = tag_counts / max(tag_counts.sum(), 1)
+    pair_p = counts / max(counts.sum(), 1)
+    with np.errstate(divide='ignore'):
+        pmi = np.log(pair_p / (tag_p[src] * tag_p[dst]))
+    pmi = np.maximum(pmi, 0.0)
+    x = np.bincount(src, weights=pmi, minlength=size) + np.bincount(dst, weights=np.where(src != dst, pmi, 0.0), minlength=size)
+    return x / x.sum() if x.sum() > 0 else np.full(size, 1.0 / max(size, 1))
+
+def calculate_ranks(tp, pmgr, mode, tol=1e-6, max_iter=100, initial=None):
+    """
+    Calculates tag ranks for a rank mode.
+
+    Example:
+
+        >>> ranks = calculate_ranks(tp, pmgr, 'pagerank')
+        >>> tp.set_ranks(ranks)
+
+    Args:
+
+        tp (Tag_processor): instance of a Tag_processor
+        pmgr (Pair_mgr): instance of Pair_mgr
+        mode (str): one of RANK_MODES
+        tol (float): a tolerance for power iteration
+        max_iter (int): a maximum iteration count for power iteration
+        initial (numpy.ndarray): previous ranks indexed by tag IDs for a warm start, see :code:`initial_ranks`
+
+    Returns:
+
+        a rank vector indexed by tag IDs, None for the "frequency" mode
+    """
+    if mode not in RANK_MODES:
+        raise ValueError('Unknown rank mode: {}'.format(mode))
+    if mode == 'frequency':
+        return None
+    size = len(tp.tag_list)
+    src, dst, counts = pmgr.get_arrays()
+    weights = counts.astype(np.float64)
+    if mode == 'pagerank':
+        return pagerank(src, dst, weights, size, tol=tol, max_iter=max_iter, initial=initial)
+    if mode == 'eigenvector':
+        return eigenvector_centrality(src, dst, weights, size, tol=tol, max_iter=max_iter, initial=initial)
+    tag_counts = np.array([tp.tag_dict.get(key, 0) for key in tp.tag_list], dtype=np.float64)
+    return pmi_degree(src, dst, counts, tag_counts)
@@ -2,12 +2,14 @@
 This module contains:
 
 * a generic tag processing class that corrects case,
-  stores a tag list, counts tags
+  stores a tag list, counts tags, optionally merges tag variants
+  using :code:`lib.canon.Tag_canonicalizer`
 * a function that extracts a list of tags from a CLIP prompt string
 """
 
 from collections import defaultdict
 from .prompts import prompt_split
+from .canon import normalize_tag
 
 def extract_tags(prompt):
     """
@@ -41,21 +43,36 @@ class Tag_processor:
     """
     Used to store tag indices, proper tag cases, global count of the tags.
 
+    Args:
+
+        canonicalizer (Tag_canonicalizer): maps raw tags to canonical keys,
+            tags are only lowercased if it's not provided
+
     Attributes:
 
-        case_fix_dict (dict): associates the lowercase string with properly cased ones
+        case_fix_dict (dict): associates the lowercase string with the most used case
+        case_count_dict (defaultdict): counts each case used for a lowercase string
         tag_list (list): a list of enumerated lowercase strings
+        tag_index (dict): associates the lowercase strings with their IDs
         global_tag_count (int): a count of all the tags added
     """
 
-    # Store initial case for each tag
-    case_fix_dict = {}
-    # Used to enumerate the tags
-    tag_list = []
-    # Counts tags
-    tag_dict = defaultdict(int)
-    # Full amount of all added tags
-    global_tag_count = 0
+    def __init__(self, canonicalizer=None):
+        self.canonicalizer = canonicalizer
+        # Store the most used case for each tag
+        self.case_fix_dict = {}
+        # Counts each case for each tag
+        self.case_count_dict = defaultdict(lambda: defaultdict(int))
+        # Used to enumerate the tags
+        self.tag_list = []
+        # Used to look up tag IDs
+        self.tag_index = {}
+        # Counts tags
+        self.tag_dict = defaultdict(int)
+        # Full amount of all added tags
+        self.global_tag_count = 0
+        # Ranks replacing the frequency ones, see set_ranks
+        self.ranks = None
 
     def get_tag_rank(self, tag_id):
         """
@@ -65,10 +82,23 @@ class Tag_processor:
 
         Returns:
 
-            a rank of a tag, the quotient of tag count divided by the global tag count
+            a rank of a tag, the quotient of tag count divided by the global tag count,
+            or a rank provided with :code:`set_ranks`
         """
+        if self.ranks is not None:
+            return float(self.ranks[tag_id])
         return self.tag_dict[ self.tag_list[tag_id] ] / self.global_tag_count
 
+    def set_ranks(self, ranks):
+        """
+        Replaces frequency ranks, e.g. with centrality ranks from :code:`lib.rank`.
+
+        Args:
+
+            ranks (list): a rank for each tag ID, None restores frequency ranks
+        """
+        self.ranks = ranks
+
     def put_tag(self, tag):
         """
         Args:
@@ -89,16 +119,85 @@ class Tag_processor:
             1
             >>> tp.put_tag('DSLR')
             2
+            >>> tp.put_tag('hdr')
+            1
         """
-        # Store tag cases
-        self.case_fix_dict[tag.lower()] = tag
+        if self.canonicalizer is not None:
+            key = self.canonicalizer.canonicalize(tag)
+            # Aliases vote for the canonical name, spelled as in the alias table
+            tag = self.canonicalizer.aliases.get(normalize_tag(tag), tag)
+        else:
+            key = tag.lower()
+        # Store tag cases, the most used one wins
+        case_counts = self.case_count_dict[key]
+        case_counts[tag] += 1
+        if key not in self.case_fix_dict or case_counts[tag] > case_counts[self.case_fix_dict[key]]:
+            self.case_fix_dict[key] = tag
         # Register a tag for indexing
-        if tag.lower() not in self.tag_list: self.tag_list.append(tag.lower())
+        if key not in self.tag_index:
+            self.tag_index[key] = len(self.tag_list)
+            self.tag_list.append(key)
         # Update the counter for a given tag
-        self.tag_dict[tag.lower()] += 1
+        self.tag_dict[key] += 1
         # Update a global tag count
         self.global_tag_count += 1
-        return self.tag_list.index(tag.lower())
+        return self.tag_index[key]
+
+    def get_tag_id(self, tag):
+        """
+        Args:
+
+            tag (str): a tag name, case-insensitive
+
+        Returns:
+
+            a tag ID or None if a tag is unknown
+
+        Example:
+
+            >>> from lib.tags import Tag_processor
+            >>> tp = Tag_processor()
+            >>> tp.put_tags(['vray', 'HDR'])
+            [0, 1]
+            >>> tp.get_tag_id('hdr')
+            1
+        """
+        if self.canonicalizer is not None:
+            key = self.canonicalizer.lookup(tag)
+        else:
+            key = tag.lower()
+        return self.tag_index.get(key)
+
+    def reset_counts(self):
+        """
+        Resets tag counts, but keeps tag IDs and cases,
+        so a subset of prompts can be counted with :code:`count_tag_numbers`.
+        """
+        self.tag_dict = defaultdict(int)
+        self.global_tag_count = 0
+
+    def count_tag_numbers(self, tag_numbers):
+        """
+        Updates the counters for already known tags.
+
+        Args:
+
+            tag_numbers (list): a list of tag IDs
+
+        Example:
+
+            >>> from lib.tags import Tag_processor
+            >>> tp = Tag_processor()
+            >>> tp.put_tags(['vray', 'HDR'])
+            [0, 1]
+            >>> tp.reset_counts()
+            >>> tp.count_tag_numbers([1])
+            >>> tp.get_tag_numbers()
+            [('HDR', 1)]
+        """
+        for tag_number in tag_numbers:
+            self.tag_dict[ self.tag_list[tag_number] ] += 1
+            self.global_tag_count += 1
 
     def put_tags(self, tag_list):
         """
@@ -148,7 +247,8 @@ class Tag_processor:
         """
         Returns:
 
-            A list of dictionaries with "id", "name" and "rank" attribute.
+            A list of dictionaries with "id", "name" and "rank" attribute,
+            tags that weren't counted since :code:`reset_counts` are skipped.
             ID is an integer,
             name is a string,
             a rank is a float value containing the quotient of tag count divided by the global tag count.
@@ -178,6 +278,7 @@ class Tag_processor:
             }
             for tag_id
             in range(len(self.tag_list))
+            if self.tag_dict.get(self.tag_list[tag_id])
         ]
 
     def get_tag_numbers(self):
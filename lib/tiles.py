@@ -0,0 +1,265 @@
+"""
+Contains a tiled, multi-resolution graph export for web visualization.
+
+Node positions are precomputed once, then the layout is split into a quadtree:
+zoom level :code:`z` has :code:`2 ** z` by :code:`2 ** z` cells.
+
+* Each cell of a level gets up to :code:`nodes_per_tile` nodes with the highest "rank"
+  that weren't placed on coarser levels
+* An edge appears on the level where both of its nodes are visible,
+  in the cell of its most detailed node; up to :code:`edges_per_tile` heaviest edges are kept,
+  the rest are moved to the next level
+
+Levels are added until all the nodes and edges are placed, so no tile exceeds the limits.
+
+Supported layouts:
+
+* :code:`spring`: a force-directed layout, readable, but each iteration costs
+  O(n²) time for n nodes, so it's slow beyond a few thousand nodes;
+  fewer iterations make it faster and rougher
+* :code:`spectral`: positions from Laplacian eigenvectors, a sparse eigenvalue problem
+  that scales to large graphs, but places nodes less evenly
+
+A viewer loads tiles of levels up to the current zoom for the visible cells only.
+Each tile is written as soon as it's ready, to :code:`<level>/<x>_<y>.json`,
+with columnar "nodes" and "edges" lists. A :code:`manifest.json` file
+lists the levels, the layout bounds and the tiles with their sizes.
+"""
+
+from os import makedirs
+from os.path import join
+from json import dump
+from networkx import spring_layout, spectral_layout
+import numpy as np
+
+TILE_LAYOUTS = ['spring', 'spectral']
+
+def graph_arrays(G, seed=0, layout='spring', iterations=50):
+    """
+    Calculates a graph layout, converts nodes and edges to NumPy arrays.
+
+    Args:
+
+        G: a NetworkX graph instance with "name" and "rank" node attributes
+        seed (int): a random seed for the layout
+        layout (str): one of TILE_LAYOUTS
+        iterations (int): an iteration count for the "spring" layout
+
+    Returns:
+
+        a tuple of dicts: nodes with "id", "name", "x", "y" and "rank" arrays,
+        edges with "src", "dst" and "weight" arrays
+    """
+    if layout not in TILE_LAYOUTS:
+        raise ValueError('Unknown layout: {}'.format(layout))
+    if layout == 'spring':
+        pos = spring_layout(G, iterations=iterations, seed=seed)
+    else:
+        pos = spectral_layout(G)
+    node_ids = [node for node, data in G.nodes(data=True) if 'name' in data]
+    nodes = {
+        'id': np.array(node_ids, dtype=np.int64),
+        'name': [G.nodes[node]['name'] for node in node_ids],
+        'x': np.array([pos[node][0] for node in node_ids], dtype=np.float64),
+        'y': np.array([pos[node][1] for node in node_ids], dtype=np.float64),
+        'rank': np.array([G.nodes[node]['rank'] for node in node_ids], dtype=np.float64)
+    }
+    # Map node IDs to node array positions
+    position = {node: index for index, node in enumerate(node_ids)}
+    edge_list = [
+        (position[u], position[v], data.get('weight', 1.0))
+        for u, v, data in G.edges(data=True)
+    ]
+    edge_array = np.array(edge_list, dtype=np.float64).reshape(-1, 3)
+    edges = {
+        'src': edge_array[:, 0].astype(np.int64),
+        'dst': edge_array[:, 1].astype(np.int64),
+        'weight': edge_array[:, 2]
+    }
+    return nodes, edges
+
+def cell_indices(x, y, level):
+    """
+    Args:
+
+        x (numpy.ndarray): x coordinates, between 0 and 1
+        y (numpy.ndarray): y coordinates, between 0 and 1
+        level (int): a zoom level
+
+    Returns:
+
+        a tuple of integer arrays: cell columns and rows
+    """
+    size = 2 ** level
+    return (
+        np.clip((x * size).astype(np.int64), 0, size - 1),
+        np.clip((y * size).astype(np.int64), 0, size - 1)
+    )
+
+def top_per_cell(cells, keys, limit):
+    """
+    Selects up to :code:`limit` items with the highest keys in each cell.
+
+    Example:
+
+        >>> import numpy as np
+        >>> from lib.tiles import top_per_cell
+        >>> top_per_cell(np.array([0, 0, 0, 1]), np.array([0.1, 0.5, 0.3, 0.2]), 2)
+        array([False,  True,  True,  True])
+
+    Args:
+
+        cells (numpy.ndarray): a cell number for each item
+        keys (numpy.ndarray): a sort key for each item
+        limit (int): a maximum item count per cell
+
+    Returns:
+
+        a boolean mask of selected items
+    """
+    order = np.lexsort((-keys, cells))
+    sorted_cells = cells[order]
+    # Position of each item inside its cell
+    starts = np.searchsorted(sorted_cells, sorted_cells, side='left')
+    selected = np.zeros(len(cells), dtype=bool)
+    selected[order] = (np.arange(len(cells)) - starts) < limit
+    return selected
+
+def group_by_cell(cells, mask):
+    """
+    Groups selected items by cells.
+
+    Args:
+
+        cells (numpy.ndarray): a cell number for each item
+        mask (numpy.ndarray): a boolean mask of selected items
+
+    Returns:
+
+        a dict associating cell numbers with arrays of item indices
+    """
+    index = np.flatnonzero(mask)
+    index = index[np.argsort(cells[index], kind='stable')]
+    unique_cells, starts = np.unique(cells[index], return_index=True)
+    return dict(zip(unique_cells.tolist(), np.split(index, starts[1:])))
+
+def write_tile(output_dir, level, column, row, nodes, node_index, edges, edge_index):
+    """
+    Writes a single tile file.
+
+    Returns:
+
+        a manifest entry for a tile
+    """
+    tile = {
+        'nodes': {
+            'id': nodes['id'][node_index].tolist(),
+            'name': [nodes['name'][index] for index in node_index],
+            'x': np.round(nodes['x'][node_index], 5).tolist(),
+            'y': np.round(nodes['y'][node_index], 5).tolist(),
+            'rank': nodes['rank'][node_index].tolist()
+        },
+        'edges': {
+            'source': nodes['id'][edges['src'][edge_index]].tolist(),
+            'target': nodes['id'][edges['dst'][edge_index]].tolist(),
+            'weight': edges['weight'][edge_index].tolist()
+        }
+    }
+    name = '{}_{}.json'.format(column, row)
+    with open(join(output_dir, str(level), name), 'w', encoding='utf-8') as tile_file:
+        dump(tile, tile_file, separators=(',', ':'), ensure_ascii=False)
+    return {
+        'x': int(column),
+        'y': int(row),
+        'path': '{}/{}'.format(level, name),
+        'nodes': len(node_index),
+        'edges': len(edge_index)
+    }
+
+def export_tiles(G, output_dir, nodes_per_tile=64, edges_per_tile=256, layout='spring', iterations=50, seed=0):
+    """
+    Exports a graph as quadtree tiles with a manifest.
+
+    Example:
+
+        >>> export_tiles(G, './tiles')
+
+    Args:
+
+        G: a NetworkX graph instance with "name" and "rank" node attributes
+        output_dir (str): an output directory, created if it doesn't exist
+        nodes_per_tile (int): a maximum count of new nodes per tile
+        edges_per_tile (int): a maximum count of new edges per tile
+        layout (str): one of TILE_LAYOUTS
+        iterations (int): an iteration count for the "spring" layout
+        seed (int): a random seed for the layout
+
+    Returns:
+
+        a manifest dict
+    """
+    nodes, edges = graph_arrays(G, seed, layout, iterations)
+    node_count = len(nodes['id'])
+    # Normalize the layout to the [0, 1] range
+    bounds = {'min_x': 0.0, 'min_y': 0.0, 'max_x': 1.0, 'max_y': 1.0}
+    if node_count:
+        bounds = {
+            'min_x': float(nodes['x'].min()), 'min_y': float(nodes['y'].min()),
+            'max_x': float(nodes['x'].max()), 'max_y': float(nodes['y'].max())
+        }
+        for axis in ['x', 'y']:
+            span = (bounds['max_' + axis] - bounds['min_' + axis]) or 1.0
+            nodes[axis] = (nodes[axis] - bounds['min_' + axis]) / span
+    # A level where each node appears first, -1 if it's not placed yet
+    node_level = np.full(node_count, -1, dtype=np.int64)
+    edge_placed = np.zeros(len(edges['src']), dtype=bool)
+    manifest = {
+        'levels': 0,
+        'bounds': bounds,
+        'nodes': node_count,
+        'edges': len(edges['src']),
+        'tiles': []
+    }
+    level = 0
+    # Add levels until all the nodes and edges are placed,
+    # each level places at least one pending node or edge per non-empty cell
+    while level == 0 or (node_level < 0).any() or not edge_placed.all():
+        makedirs(join(output_dir, str(level)), exist_ok=True)
+        columns, rows = cell_indices(nodes['x'], nodes['y'], level)
+        # Number the occupied cells, "column * 2 ** level + row" overflows on deep levels
+        cell_keys, cells = np.unique(np.stack((columns, rows), axis=1), axis=0, return_inverse=True)
+        cells = cells.ravel()
+        # Place the highest ranked remaining nodes of each cell
+        pending = node_level < 0
+        new_nodes = pending.copy()
+        new_nodes[pending] = top_per_cell(cells[pending], nodes['rank'][pending], nodes_per_tile)
+        node_level[new_nodes] = level
+        # Edges with both nodes visible go to the cell of the most detailed node
+        visible = node_level >= 0
+        candidates = ~edge_placed & visible[edges['src']] & visible[edges['dst']]
+        detailed = np.where(
+            node_level[edges['src']] >= node_level[edges['dst']], edges['src'], edges['dst']
+        )
+        edge_cells = cells[detailed]
+        new_edges = candidates.copy()
+        new_edges[candidates] = top_per_cell(
+            edge_cells[candidates], edges['weight'][candidates], edges_per_tile
+        )
+        edge_placed |= new_edges
+        # Write the tiles of a level one by one
+        node_groups = group_by_cell(cells, new_nodes)
+        edge_groups = group_by_cell(edge_cells, new_edges)
+        empty = np.zeros(0, dtype=np.int64)
+        level_tiles = []
+        for cell in sorted(set(node_groups) | set(edge_groups)):
+            level_tiles.append(write_tile(
+                output_dir, level, cell_keys[cell, 0], cell_keys[cell, 1],
+                nodes, node_groups.get(cell, empty),
+                edges, edge_groups.get(cell, empty)
+            ))
+        manifest['tiles'].append(level_tiles)
+        level += 1
+    manifest['levels'] = level
+    with open(join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as manifest_file:
+        dump(manifest, manifest_file, indent=4)
+    return manifest
@@ -8,9 +8,11 @@ Allows you to use these modes:
 * :code:`count_tags` - simply displays tags found in a certain path, allows filtering
 * :code:`display_graph` - displays a graph using Matplotlib's WxWidgets interface
 * :code:`export_graph` - exports graph contents as a JSON file
+* :code:`export_tables` - exports tag and edge tables as Parquet, Arrow or NumPy files
+* :code:`export_tiles` - exports a graph as zoom level tiles for the web visualization
 """
 
-from lib.cmd_args import configure_parser
+from lib.cmd_args import configure_parser, validate_args
 from lib.process import process_dir
 
 def main():
@@ -21,8 +23,9 @@ def main():
     """
     parser = configure_parser()
     args = parser.parse_args()
+    validate_args(parser, args)
 
-    if "mode" in args and args.mode in ['count_tags', 'display_graph', 'export_graph']:
+    if "mode" in args and args.mode in ['count_tags', 'display_graph', 'export_graph', 'export_tables', 'export_tiles']:
         process_dir(args)
     else:
         # Display all available arguments for an unknown mode.